@@ -1,8 +1,14 @@
-import aiohttp
 import asyncio
-import json
+import ijson
+import orjson
 import os
 import logging
+from aiolimiter import AsyncLimiter
+from operator import itemgetter
+
+from http_client import open_session, run_loop
+from jsonl_writer import JsonlWriter
+from progress_store import ProgressStore
 
 HEADERS = {
     'Host': 'api.ah.nl',
@@ -11,80 +17,108 @@ HEADERS = {
     'content-type': 'application/json; charset=UTF-8',
 }
 
+get_webshop_id = itemgetter("webshopId")
+
 class AHConnector:
     def __init__(self):
         self.base_url = "https://api.ah.nl/mobile-services"
         self.auth_url = "https://api.ah.nl/mobile-auth/v1/auth/token/anonymous"
         self.access_token = None
+        self.auth_headers = None
 
     async def authenticate(self, session):
         """Fetch an anonymous access token."""
         payload = {"clientId": "appie"}
-        async with session.post(self.auth_url, headers=HEADERS, json=payload) as response:
+        async with session.post(self.auth_url, json=payload) as response:
             response.raise_for_status()
-            self.access_token = (await response.json()).get("access_token")
+            self.access_token = (await response.json(loads=orjson.loads)).get("access_token")
+            self.auth_headers = {"Authorization": f"Bearer {self.access_token}"}
             logging.info("Authenticated successfully.")
 
     async def get_categories(self, session):
         """Fetch main categories."""
         url = f"{self.base_url}/v1/product-shelves/categories"
-        headers = {**HEADERS, "Authorization": f"Bearer {self.access_token}"}
-        async with session.get(url, headers=headers) as response:
+        async with session.get(url, headers=self.auth_headers) as response:
             response.raise_for_status()
-            return await response.json()
+            return await response.json(loads=orjson.loads)
 
     async def get_sub_categories(self, session, category):
         """Fetch subcategories for a given category."""
         category_id = category['id']
         url = f"{self.base_url}/v1/product-shelves/categories/{category_id}/sub-categories"
-        headers = {**HEADERS, "Authorization": f"Bearer {self.access_token}"}
-        async with session.get(url, headers=headers) as response:
+        async with session.get(url, headers=self.auth_headers) as response:
             response.raise_for_status()
-            return await response.json()
+            return await response.json(loads=orjson.loads)
 
     async def search_products(self, session, query, page=0, size=750):
-        """Fetch products by category with pagination."""
+        """Fetch one page of products by category, parsed incrementally from the response stream."""
         url = f"{self.base_url}/product/search/v2"
-        headers = {**HEADERS, "Authorization": f"Bearer {self.access_token}"}
         params = {"query": query, "page": page, "size": size}
-        async with session.get(url, headers=headers, params=params) as response:
+        async with session.get(url, headers=self.auth_headers, params=params) as response:
             response.raise_for_status()
-            return await response.json()
+            return [p async for p in ijson.items_async(response.content, "products.item", use_float=True)]
 
 class AHScraper:
     def __init__(self):
         self.connector = AHConnector()
-        self.output_file = "data/ah_products.json"
-        self.progress_file = "data/ah_scrape_progress.json"
-        self.scraped_ids = set()
+        self.output_file = "data/ah_products.jsonl"
         self.total_scraped_items = 0  # Track the total number of scraped items
+        self.num_workers = 8  # Subcategories scraped concurrently
+        self.limiter = AsyncLimiter(max_rate=5, time_period=1)  # Search requests per second, shared by all workers
         os.makedirs("data", exist_ok=True)
 
         # Load progress
-        if os.path.exists(self.progress_file):
-            with open(self.progress_file, "r") as f:
-                self.scraped_ids = set(json.load(f))
+        self.progress = ProgressStore("ah")
+        self.scraped_ids = self.progress.load("product")
+        self.scraped_subcategories = self.progress.load("subcategory")
+        self.writer = JsonlWriter(self.output_file, self.progress)
 
-    async def scrape(self):
+    async def scrape(self, connector=None):
         """Main scraping method."""
-        async with aiohttp.ClientSession() as session:
+        async with open_session(HEADERS, 30, connector) as session, self.writer:
             await self.connector.authenticate(session)
 
             categories = await self.connector.get_categories(session)
-            all_products = []
 
-            for category in categories:
-                subcategories = await self.connector.get_sub_categories(session, category)
-                for subcategory in subcategories.get('children', []):
-                    await self.scrape_subcategory(session, subcategory, all_products)
+            queue = asyncio.Queue()
+            for subcategory in await self.get_all_sub_categories(session, categories):
+                queue.put_nowait(subcategory)
+
+            await asyncio.gather(*(
+                self.scrape_worker(session, queue) for _ in range(self.num_workers)
+            ))
 
-            self.save_progress()
             logging.info(f"Scraping complete. Total products scraped: {self.total_scraped_items}")
 
-    async def scrape_subcategory(self, session, subcategory, all_products):
+    async def get_all_sub_categories(self, session, categories):
+        """Fetch the subcategories of all categories concurrently."""
+        sem = asyncio.Semaphore(16)
+
+        async def fetch_children(category):
+            async with sem:
+                subcategories = await self.connector.get_sub_categories(session, category)
+            return subcategories.get('children', [])
+
+        results = await asyncio.gather(*(fetch_children(category) for category in categories))
+        return [subcategory for children in results for subcategory in children]
+
+    async def scrape_worker(self, session, queue):
+        """Scrape subcategories from the queue until it is empty."""
+        while True:
+            try:
+                subcategory = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            # A failed subcategory is left unmarked in progress.db, so the next run retries it
+            try:
+                await self.scrape_subcategory(session, subcategory)
+            except Exception as e:
+                logging.error(f"Failed to scrape subcategory '{subcategory.get('name')}': {e}")
+
+    async def scrape_subcategory(self, session, subcategory):
         """Scrape a single subcategory."""
         subcategory_name = subcategory.get('name')
-        if subcategory_name in self.scraped_ids:
+        if subcategory_name in self.scraped_subcategories:
             logging.info(f"Subcategory '{subcategory_name}' already scraped. Skipping.")
             return
 
@@ -93,43 +127,31 @@ class AHScraper:
         subcategory_scraped_items = 0  # Track items for this subcategory
 
         while True:
-            data = await self.connector.search_products(session, query=subcategory_name, page=page)
-            products = data.get("products", [])
+            async with self.limiter:
+                products = await self.connector.search_products(session, query=subcategory_name, page=page)
             if not products:
                 break
 
             # Deduplicate and save products
-            new_products = [p for p in products if p["webshopId"] not in self.scraped_ids]
-            all_products.extend(new_products)
-            self.write_products(new_products)
+            ids = list(map(get_webshop_id, products))
+            new_ids = set(ids) - self.scraped_ids
+            new_products = [p for p, i in zip(products, ids) if i in new_ids]
+            self.write_products(new_products, new_ids)
 
-            # Update scraped IDs
-            self.scraped_ids.update(p["webshopId"] for p in new_products)
+            # Update scraped IDs; the writer records them in progress.db once the products are written
+            self.scraped_ids |= new_ids
             subcategory_scraped_items += len(new_products)
             self.total_scraped_items += len(new_products)
 
             page += 1
-            await asyncio.sleep(0.5)
 
-        self.scraped_ids.add(subcategory_name)
+        self.scraped_subcategories.add(subcategory_name)
+        self.writer.record("subcategory", [subcategory_name])
         logging.info(f"Subcategory '{subcategory_name}' scraped: {subcategory_scraped_items} items.")
 
-    def write_products(self, products):
-        """Append products to the output JSON file."""
-        if not os.path.exists(self.output_file):
-            with open(self.output_file, "w") as f:
-                json.dump([], f)
-
-        with open(self.output_file, "r+") as f:
-            existing_data = json.load(f)
-            existing_data.extend(products)
-            f.seek(0)
-            json.dump(existing_data, f, ensure_ascii=False, indent=4)
-
-    def save_progress(self):
-        """Save progress to a file."""
-        with open(self.progress_file, "w") as f:
-            json.dump(list(self.scraped_ids), f)
+    def write_products(self, products, ids):
+        """Queue products to be appended to the output JSONL file and their IDs to be saved as progress."""
+        self.writer.write(products, ids)
 
 # Initialize logging
 def initialize_logging(debug_level=logging.INFO):
@@ -145,4 +167,4 @@ def initialize_logging(debug_level=logging.INFO):
 if __name__ == "__main__":
     initialize_logging()
     scraper = AHScraper()
-    asyncio.run(scraper.scrape())
+    run_loop(scraper.scrape())
@@ -1,44 +1,37 @@
-import aiohttp
 import asyncio
-import json
+import ijson
+import orjson
 import os
 import logging
+from operator import itemgetter
+
+from http_client import open_session, run_loop
+from jsonl_writer import JsonlWriter
+from progress_store import ProgressStore
 
 HEADERS = {
     'Accept': 'application/json',
     'User-Agent': 'ALDINord-App-NL/4.23.0 (nl.aldi.aldinordmobileapp; build:2403140920.292755; iOS 17.4.1) Alamofire/5.5.0',
 }
 
+get_article_id = itemgetter("articleId")
+
 class AldiScraper:
     def __init__(self):
         self.base_url = "https://webservice.aldi.nl/api/v1"
-        self.output_file = "data/aldi_products.json"
-        self.progress_file = "data/aldi_scrape_progress.json"
-        self.scraped_products = set()  # Tracks globally scraped product IDs
-        self.scraped_categories = set()  # Tracks scraped categories to avoid reprocessing
+        self.output_file = "data/aldi_products.jsonl"
         self.total_scraped_items = 0
         os.makedirs("data", exist_ok=True)
 
-        # Clear output file at the start of a new scrape
-        with open(self.output_file, "w") as f:
-            json.dump([], f)  # Start with an empty array
-
         # Load progress
-        if os.path.exists(self.progress_file):
-            with open(self.progress_file, "r") as f:
-                try:
-                    progress_data = json.load(f)
-                    if isinstance(progress_data, dict):
-                        self.scraped_products = set(progress_data.get("scraped_products", []))
-                        self.scraped_categories = set(progress_data.get("scraped_categories", []))
-                    else:
-                        logging.warning("Progress file format is invalid. Resetting progress.")
-                except json.JSONDecodeError:
-                    logging.warning("Progress file is corrupted. Resetting progress.")
-
-    async def scrape(self):
+        self.progress = ProgressStore("aldi")
+        self.scraped_products = self.progress.load("product")  # Tracks globally scraped product IDs
+        self.scraped_categories = self.progress.load("category")  # Tracks scraped categories to avoid reprocessing
+        self.writer = JsonlWriter(self.output_file, self.progress)
+
+    async def scrape(self, connector=None):
         """Main scraping method."""
-        async with aiohttp.ClientSession() as session:
+        async with open_session(HEADERS, 30, connector) as session, self.writer:
             categories = await self.fetch_categories(session)
 
             if not categories:
@@ -48,15 +41,14 @@ class AldiScraper:
             for category in categories.get("productCollections", []):
                 await self.scrape_category(session, category)
 
-            self.save_progress()
             logging.info(f"Scraping complete. Total products scraped: {self.total_scraped_items}")
 
     async def fetch_categories(self, session):
         """Fetch all categories."""
         url = f"{self.base_url}/products.json"
-        async with session.get(url, headers=HEADERS) as response:
+        async with session.get(url) as response:
             if response.status == 200:
-                return await response.json()
+                return await response.json(loads=orjson.loads)
             logging.error("Failed to fetch categories.")
             return None
 
@@ -72,30 +64,25 @@ class AldiScraper:
             return
 
         logging.info(f"Scraping category: {category_id}")
-        products = await self.fetch_products(session, category_id)
-
-        if not products:
-            logging.warning(f"No products found for category {category_id}.")
-            return
-
-        # Flatten articleGroups to get individual products
-        articles = []
-        for group in products:
-            articles.extend(group.get("articles", []))
+        articles = await self.fetch_products(session, category_id)
 
         if not articles:
             logging.warning(f"No articles found for category {category_id}.")
             return
 
         logging.info(f"Category '{category_id}' returned {len(articles)} articles.")
-        new_products = [p for p in articles if p.get("articleId") not in self.scraped_products]
+        ids = list(map(get_article_id, articles))
+        new_ids = set(ids) - self.scraped_products
+        new_products = [p for p, i in zip(articles, ids) if i in new_ids]
 
         if not new_products:
             logging.warning(f"No new products found for category {category_id}.")
             return
 
-        self.write_products(new_products)
-        self.scraped_products.update(p["articleId"] for p in new_products)
+        # The writer records the IDs and the category in progress.db once the products are written
+        self.write_products(new_products, new_ids)
+        self.writer.record("category", [category_id])
+        self.scraped_products |= new_ids
         self.scraped_categories.add(category_id)  # Track processed categories
         self.total_scraped_items += len(new_products)
 
@@ -103,33 +90,24 @@ class AldiScraper:
         logging.info(f"Total unique products so far: {len(self.scraped_products)}")
 
     async def fetch_products(self, session, category_id):
-        """Fetch products for a category."""
+        """Fetch the articles of all article groups in a category, parsed incrementally from the response stream."""
         url = f"{self.base_url}/products/{category_id}.json"
-        async with session.get(url, headers=HEADERS) as response:
+        async with session.get(url) as response:
             if response.status == 200:
-                data = await response.json()
-                return data.get("articleGroups", [])
+                return [
+                    article
+                    async for article in ijson.items_async(
+                        response.content, "articleGroups.item.articles.item", use_float=True
+                    )
+                ]
             logging.error(f"Failed to fetch products for category {category_id}.")
             return None
 
-    def write_products(self, products):
-        """Append products to the output JSON file."""
+    def write_products(self, products, ids):
+        """Queue products to be appended to the output JSONL file and their IDs to be saved as progress."""
         if not products:
             return
-        with open(self.output_file, "r+") as f:
-            existing_data = json.load(f)
-            existing_data.extend(products)
-            f.seek(0)
-            json.dump(existing_data, f, ensure_ascii=False, indent=4)
-
-    def save_progress(self):
-        """Save progress to a file."""
-        progress_data = {
-            "scraped_products": list(self.scraped_products),
-            "scraped_categories": list(self.scraped_categories),
-        }
-        with open(self.progress_file, "w") as f:
-            json.dump(progress_data, f, ensure_ascii=False, indent=4)
+        self.writer.write(products, ids)
 
 # Initialize logging
 def initialize_logging(debug_level=logging.INFO):
@@ -145,4 +123,4 @@ def initialize_logging(debug_level=logging.INFO):
 if __name__ == "__main__":
     initialize_logging()
     scraper = AldiScraper()
-    asyncio.run(scraper.scrape())
+    run_loop(scraper.scrape())
@@ -0,0 +1,78 @@
+import aiohttp
+import asyncio
+import logging
+import orjson
+from contextlib import nullcontext
+from random import uniform
+
+try:
+    import uvloop
+    new_event_loop = uvloop.new_event_loop
+except ImportError:
+    new_event_loop = None  # asyncio's default loop
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+
+# Keep-alive pool and DNS cache shared by every scraper in the process
+_connector = None
+
+def get_connector():
+    """Return the shared TCP connector, creating it on first use; call from within the running event loop."""
+    global _connector
+    if _connector is None or _connector.closed:
+        # enable_cleanup_closed aborts TLS transports the server dropped without a clean shutdown (needed before Python 3.12.7)
+        _connector = aiohttp.TCPConnector(
+            limit=200, limit_per_host=50, ttl_dns_cache=600, keepalive_timeout=60, enable_cleanup_closed=True
+        )
+    return _connector
+
+def open_session(headers, total_timeout, connector=None):
+    """Open a session with a shop's default headers on `connector` (the shared pool by default), leaving the pool open."""
+    return aiohttp.ClientSession(
+        connector=connector or get_connector(),
+        connector_owner=False,
+        headers=headers,
+        timeout=aiohttp.ClientTimeout(total=total_timeout),
+    )
+
+async def close_connector():
+    """Close the shared TCP connector, if one was created."""
+    global _connector
+    if _connector is not None:
+        await _connector.close()
+        _connector = None
+
+async def _run_and_close(coro):
+    try:
+        return await coro
+    finally:
+        await close_connector()
+
+def run_loop(coro):
+    """Run `coro` on a new event loop (uvloop when installed) and close the shared connector afterwards."""
+    with asyncio.Runner(loop_factory=new_event_loop) as runner:
+        return runner.run(_run_and_close(coro))
+
+async def read_json(response):
+    """`parse` for `request`: fail on error statuses and decode the whole body with orjson."""
+    response.raise_for_status()
+    return await response.json(loads=orjson.loads)
+
+async def request(session, method, url, parse, *, sem=None, retries=MAX_RETRIES, **kwargs):
+    """Send a request and return `await parse(response)`, retrying throttled, 5xx and network failures with backoff."""
+    for attempt in range(retries):
+        try:
+            # `sem` is any async context manager limiting requests in flight (a Semaphore or an AsyncLimiter)
+            async with sem or nullcontext(), session.request(method, url, **kwargs) as response:
+                if response.status in RETRY_STATUSES:
+                    response.raise_for_status()
+                return await parse(response)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            retryable = not isinstance(e, aiohttp.ClientResponseError) or e.status in RETRY_STATUSES
+            if not retryable or attempt == retries - 1:
+                raise
+            # Back off outside the semaphore so waiting requests don't hold a slot
+            delay = 2 ** attempt + uniform(0, 0.5)
+            logging.warning(f"Request to {url} failed ({type(e).__name__}: {e}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
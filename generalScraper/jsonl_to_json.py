@@ -0,0 +1,36 @@
+import os
+import sys
+import logging
+import orjson
+
+def convert(jsonl_path, json_path):
+    """Convert a JSONL product file into a single JSON array file; returns the number of products."""
+    count = 0
+    with open(jsonl_path, "rb") as src, open(json_path, "wb") as dst:
+        dst.write(b"[")
+        for line_number, line in enumerate(src, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            # Lines are copied verbatim; parsing only rejects a record truncated by an interrupted scrape
+            try:
+                orjson.loads(line)
+            except orjson.JSONDecodeError:
+                logging.warning(f"Skipping invalid JSON on line {line_number} of {jsonl_path}")
+                continue
+            if count:
+                dst.write(b",")
+            dst.write(line)
+            count += 1
+        dst.write(b"]")
+    return count
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if len(sys.argv) not in (2, 3):
+        sys.exit("Usage: python jsonl_to_json.py <products.jsonl> [products.json]")
+
+    jsonl_path = sys.argv[1]
+    json_path = sys.argv[2] if len(sys.argv) == 3 else f"{os.path.splitext(jsonl_path)[0]}.json"
+    total = convert(jsonl_path, json_path)
+    logging.info(f"Wrote {total} products to {json_path}")
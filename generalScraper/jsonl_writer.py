@@ -0,0 +1,69 @@
+import asyncio
+import orjson
+
+def write_batch(f, data):
+    """Write and flush one batch, so a killed scraper never leaves written batches in the Python buffer."""
+    f.write(data)
+    f.flush()
+
+class JsonlWriter:
+    """Append queued product batches to a JSONL file from a background task, recording progress once they are written."""
+
+    def __init__(self, path, progress, batch_size=500):
+        self.path = path
+        self.progress = progress  # ProgressStore the written IDs are recorded in
+        self.batch_size = batch_size  # Products per write call
+        self.queue = None
+        self.task = None
+
+    async def __aenter__(self):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self.run())
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.queue.put_nowait(None)
+        await self.task
+
+    def write(self, products, ids=()):
+        """Queue products to be appended and their IDs to be recorded as scraped 'product' progress; never blocks the event loop."""
+        self.put((products, "product", ids))
+
+    def record(self, kind, ids):
+        """Queue IDs of another kind (e.g. a finished category) to be recorded once everything queued before them is written."""
+        self.put(([], kind, ids))
+
+    def put(self, item):
+        """Queue an item, failing fast if the writer task has already stopped (e.g. disk full)."""
+        if self.task.done():
+            self.task.result()  # Re-raises the error that stopped the writer
+            raise RuntimeError(f"Writer for {self.path} is closed")
+        self.queue.put_nowait(item)
+
+    async def run(self):
+        """Write queued batches until the closing sentinel (None) arrives."""
+        # One append handle for the whole run; only this task writes to it, so no lock is needed
+        with open(self.path, "ab") as f:
+            done = False
+            while not done:
+                batch = []
+                written_ids = []
+                item = await self.queue.get()
+                # Coalesce whatever is already queued into a single write
+                while True:
+                    if item is None:
+                        done = True
+                        break
+                    products, kind, ids = item
+                    batch.extend(products)
+                    written_ids.append((kind, ids))
+                    if len(batch) >= self.batch_size or self.queue.empty():
+                        break
+                    item = self.queue.get_nowait()
+
+                if batch:
+                    data = b"".join(orjson.dumps(p) + b"\n" for p in batch)
+                    await asyncio.to_thread(write_batch, f, data)
+                # Progress is committed only after its products are flushed, so a resume never skips unwritten products
+                for kind, ids in written_ids:
+                    self.progress.add(kind, ids)
@@ -1,162 +1,172 @@
-import aiohttp
 import asyncio
-import json
+import ijson
 import os
 import logging
-from random import uniform
-from urllib.parse import urlencode, quote
+from urllib.parse import quote
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
+from http_client import open_session, request, run_loop
+from jsonl_writer import JsonlWriter
+from progress_store import ProgressStore
 
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:102.0) Gecko/20100101 Firefox/102.0',
     "X-jumbo-store": "national",
 }
 
+logger = logging.getLogger(__name__)
+
 class EnhancedJumboScraper:
     def __init__(self):
         self.base_url = 'https://mobileapi.jumbo.com/v17'
         self.output_dir = "data"
-        self.products_file = f"{self.output_dir}/jumbo_products.json"
-        self.progress_file = f"{self.output_dir}/jumbo_scrape_progress.json"
+        self.products_file = f"{self.output_dir}/jumbo_products.jsonl"
         
         # Create output directory
         os.makedirs(self.output_dir, exist_ok=True)
         
+        # Limit the number of search requests in flight across all categories
+        self.semaphore = asyncio.Semaphore(15)
+
         # Initialize progress tracking
+        self.progress = ProgressStore('jumbo')
         self.scraped_products = set()
         self.load_progress()
+        self.writer = JsonlWriter(self.products_file, self.progress)
 
     def load_progress(self):
-        """Load previous scraping progress if it exists."""
-        if os.path.exists(self.progress_file):
-            try:
-                with open(self.progress_file, 'r') as f:
-                    progress = json.load(f)
-                    self.scraped_products = set(progress.get('scraped_products', []))
-                logging.info(f"📂 Loaded progress: {len(self.scraped_products)} products already scraped")
-            except json.JSONDecodeError:
-                logging.warning("⚠️ Progress file corrupted, starting fresh")
-
-    def save_progress(self):
-        """Save current scraping progress."""
-        with open(self.progress_file, 'w') as f:
-            json.dump({'scraped_products': list(self.scraped_products)}, f, indent=4)
-
-    def save_products(self, products):
-        """Save or update products in the output file."""
-        existing_products = []
-        if os.path.exists(self.products_file):
-            with open(self.products_file, 'r') as f:
-                try:
-                    existing_products = json.load(f)
-                except json.JSONDecodeError:
-                    logging.warning("⚠️ Products file corrupted, starting fresh")
-
-        # Add new products
-        existing_products.extend(products)
-        
-        # Save updated product list
-        with open(self.products_file, 'w') as f:
-            json.dump(existing_products, f, indent=4, ensure_ascii=False)
+        """Load the IDs of previously scraped products."""
+        self.scraped_products = self.progress.load('product')
+        if self.scraped_products:
+            logger.info("📂 Loaded progress: %d products already scraped", len(self.scraped_products))
+
+    def save_products(self, products, product_ids):
+        """Queue products to be appended to the output JSONL file; their IDs are saved as progress once written."""
+        self.writer.write(products, product_ids)
 
     async def get_categories(self, session):
-        """Fetch all categories."""
-        url = f"{self.base_url}/categories"
-        async with session.get(url, headers=HEADERS) as response:
+        """Fetch all categories, parsed incrementally from the response stream."""
+        async def parse(response):
+            response.raise_for_status()
+            return [c async for c in ijson.items_async(response.content, 'categories.data.item', use_float=True)]
+
+        return await request(session, 'GET', f"{self.base_url}/categories", parse)
+
+    def search_params(self, category, limit):
+        """Build the search parameters shared by every page of a category."""
+        return {
+            'limit': limit,
+            'sort': '',
+            'filters': f'category:{category["id"].removeprefix("category:")}',  # ✅ Fix: Remove extra "category:"
+            'current_url': quote(category.get('title', 'Unknown Category'), safe='')  # ✅ Fix: Force `%20` instead of `+`
+        }
+
+    async def fetch_page(self, session, base_params, offset):
+        """Fetch one page of a category's search results and return (products, total)."""
+        params = {'offset': offset, **base_params}
+        url = f"{self.base_url}/search"
+
+        async def parse(response):
+            if not response.ok:
+                response_text = await response.text()
+                logger.error("❌ Response text: %s", response_text)
             response.raise_for_status()
-            data = await response.json()
-            return data['categories']['data']
 
-    async def scrape_category(self, session, category):
-        """Scrape products for a specific category using filters=category:<id>."""
-        offset = 0
-        limit = 30
-        total_scraped = 0
-
-        while True:
-            params = {
-                'offset': offset,
-                'limit': limit,
-                'sort': '',
-                'filters': f'category:{category["id"].replace("category:", "")}',  # ✅ Fix: Remove extra "category:"
-                'current_url': quote(category.get('title', 'Unknown Category'), safe='')  # ✅ Fix: Force `%20` instead of `+`
+            # Only the `products` object is built; filters and other facets are skipped while parsing
+            return {
+                key: value
+                async for key, value in ijson.kvitems_async(response.content, 'products', use_float=True)
             }
-            
-            url = f"{self.base_url}/search"
-            full_url = f"{url}?{urlencode(params, safe=':,')}"  # ✅ Fix: Correct encoding
 
-            logging.info(f"📡 Full GET Request: {full_url}")
+        search_results = await request(session, 'GET', url, parse, sem=self.semaphore, params=params)
+
+        logger.debug("🔍 Response Keys: %s", search_results.keys())
+        return search_results.get('data', []), search_results.get('total', 0)
+
+    def save_page(self, category, products):
+        """Save the products of a page that were not scraped before and return how many there were."""
+        title = category.get('title', 'Unknown Category')
+        # Products seen before are dropped up front; only new ones get an output entry built
+        new_products = {p['id']: p for p in products if p.get('id') and p['id'] not in self.scraped_products}
+        if not new_products:
+            return 0
+
+        # ✅ Store only the main category
+        detailed_products = [{'product': p, 'mainCategory': title} for p in new_products.values()]
+        self.scraped_products.update(new_products)
+        self.save_products(detailed_products, new_products.keys())
+        logger.info("✅ Scraped %d new products from %s (total %d)", len(new_products), title, len(self.scraped_products))
+        return len(new_products)
+
+    async def scrape_page(self, session, category, base_params, offset):
+        """Fetch and save a single page of a category."""
+        try:
+            products, _ = await self.fetch_page(session, base_params, offset)
+        except Exception as e:
+            logger.error("❌ Error fetching category %s at offset %d: %s", category['title'], offset, e)
+            return 0
+        return self.save_page(category, products)
 
-            async with session.get(url, headers=HEADERS, params=params) as response:
-                response_text = await response.text()
-
-                try:
-                    response.raise_for_status()
-                    search_results = await response.json()
-                except Exception as e:
-                    logging.error(f"❌ Error fetching category {category['title']}: {e}")
-                    logging.error(f"❌ Response text: {response_text}")
-                    return 0
-
-                logging.info(f"🔍 Response Keys: {search_results.keys()}")
-
-                products = search_results.get('products', {}).get('data', [])
-                if not products:
-                    logging.warning(f"⚠️ No products found for category {category['title']}")
-                    break
-
-                detailed_products = []
-                for product in products:
-                    product_id = product.get('id')
-                    if product_id and product_id not in self.scraped_products:
-                        product_entry = {
-                            'product': product,
-                            'mainCategory': category.get('title', 'Unknown Category')  # ✅ Store only the main category
-                        }
-                        detailed_products.append(product_entry)
-                        self.scraped_products.add(product_id)
-                        total_scraped += 1
-                        logging.info(f"✅ Scraped: {product.get('title', 'Unknown Title')} - Category: {category.get('title', 'Unknown')}")
-
-                if detailed_products:
-                    self.save_products(detailed_products)
-                    self.save_progress()
-
-                offset += len(products)
-                await asyncio.sleep(0.2)
-        
-        logging.info(f"✅ Finished {category['title']}: {total_scraped} products")
+    async def scrape_category(self, session, category):
+        """Scrape products for a specific category using filters=category:<id>."""
+        logger.info("🔍 Processing category: %s", category['title'])
+        limit = 30
+        base_params = self.search_params(category, limit)
+
+        # The first page tells how many products the category has; the remaining pages are fetched concurrently
+        try:
+            products, total = await self.fetch_page(session, base_params, 0)
+        except Exception as e:
+            logger.error("❌ Error fetching category %s: %s", category['title'], e)
+            return 0
+
+        if not products:
+            logger.warning("⚠️ No products found for category %s", category['title'])
+            return 0
+
+        # Step by the size of the page actually returned, in case the API caps it below `limit`
+        page_size = len(products)
+        total_scraped = self.save_page(category, products)
+        total_scraped += sum(await asyncio.gather(
+            *(self.scrape_page(session, category, base_params, offset) for offset in range(page_size, total, page_size))
+        ))
+
+        logger.info("✅ Finished %s: %d products", category['title'], total_scraped)
         return total_scraped
 
-
     async def scrape_all_products(self, session):
         """Scrape all products across all categories."""
         categories = await self.get_categories(session)
-        logging.info(f"📂 Found {len(categories)} main categories")
+        logger.info("📂 Found %d main categories", len(categories))
+
+        results = await asyncio.gather(
+            *(self.scrape_category(session, category) for category in categories),
+            return_exceptions=True
+        )
 
         total_processed = 0
-        for category in categories:
-            logging.info(f"🔍 Processing category: {category['title']}")
-            total_processed += await self.scrape_category(session, category)
-            
-        logging.info(f"✅ Total products processed: {total_processed}")
+        for category, result in zip(categories, results):
+            if isinstance(result, Exception):
+                logger.error("❌ Error scraping category %s: %s", category['title'], result)
+            else:
+                total_processed += result
+
+        logger.info("✅ Total products processed: %d", total_processed)
 
-    async def scrape(self):
+    async def scrape(self, connector=None):
         """Main scraping method."""
-        async with aiohttp.ClientSession() as session:
-            logging.info("🚀 Starting enhanced Jumbo scraper...")
+        async with open_session(HEADERS, 60, connector) as session, self.writer:
+            logger.info("🚀 Starting enhanced Jumbo scraper...")
             await self.scrape_all_products(session)
-            logging.info("✅ Scraping completed!")
+            logger.info("✅ Scraping completed!")
 
 def main():
-    logging.info("🟢 Enhanced Jumbo Scraper Started")
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    logger.info("🟢 Enhanced Jumbo Scraper Started")
     scraper = EnhancedJumboScraper()
-    asyncio.run(scraper.scrape())
+    run_loop(scraper.scrape())
 
 if __name__ == "__main__":
     main()
@@ -1,9 +1,11 @@
-import aiohttp
 import asyncio
-import requests
-import json
+import ijson
+import orjson
 import os
 import logging
+import time
+
+from http_client import open_session, read_json, request, run_loop
 
 # Define constants
 HEADERS = {
@@ -20,49 +22,59 @@ BASE_URL = "https://www.plus.nl"
 CATEGORIES_ENDPOINT = "/screenservices/ECP_Product_CW/Categories/CategoryList_TF/DataActionGetMenuCategories"
 PRODUCTS_ENDPOINT = "/screenservices/ECP_Composition_CW/ProductLists/PLP_Content/DataActionGetProductListAndCategoryInfo"
 VERSION_ENDPOINT = "/moduleservices/moduleversioninfo"
+MAX_CONCURRENT_REQUESTS = 10  # Product page requests in flight across all categories
 
 OUTPUT_DIR = "data"
 CATEGORIES_FILE = os.path.join(OUTPUT_DIR, "top_level_categories.json")
 ALL_PRODUCTS_FILE = os.path.join(OUTPUT_DIR, "plus_products.json")
+CATEGORIES_TTL = 24 * 60 * 60  # Seconds a saved categories file is reused before refetching
 
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# Write a JSON file
+def write_json(path, data):
+    """Write data to a file as compact JSON; run via asyncio.to_thread to keep the event loop free."""
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(data))
+
 # Fetch API version token
 async def fetch_version_token(session):
     """Fetch the version token required for subsequent requests."""
     version_url = f"{BASE_URL}{VERSION_ENDPOINT}"
     try:
-        async with session.get(version_url, headers=HEADERS) as response:
-            response.raise_for_status()
-            data = await response.json()
-            return data.get("versionToken")
+        data = await request(session, "GET", version_url, read_json)
+        return data.get("versionToken")
     except Exception as e:
         logging.error(f"Failed to fetch version token: {e}")
         return None
 
 # Fetch all categories
 async def fetch_categories(session, version_token):
-    """Fetch all categories."""
+    """Fetch all categories and return the embedded CategoriesJson string, skipping the rest of the response."""
     categories_url = f"{BASE_URL}{CATEGORIES_ENDPOINT}"
     payload = {
         "versionInfo": {"moduleVersion": version_token, "apiVersion": "SpgKBmBbzIq67HF3dBCsXg"},
         "viewName": "MainFlow.ProductListPage",
         "screenData": {"variables": {}},
     }
+    async def parse(response):
+        response.raise_for_status()
+        categories_json = None
+        async for value in ijson.items_async(response.content, "data.CategoriesJson"):
+            categories_json = value
+        return categories_json
+
     try:
-        async with session.post(categories_url, headers=HEADERS, json=payload) as response:
-            response.raise_for_status()
-            data = await response.json()
-            return data
+        return await request(session, "POST", categories_url, parse, json=payload)
     except Exception as e:
         logging.error(f"Failed to fetch categories: {e}")
         return None
 
 # Extract top-level categories
-def extract_top_level_categories(raw_data):
+def extract_top_level_categories(categories_json):
     """Extract top-level categories (no ParentName) and exclude 'Promotions'."""
     try:
-        categories = json.loads(raw_data["data"]["CategoriesJson"])
+        categories = orjson.loads(categories_json)
         top_level_categories = [
             {
                 "Name": category["Category_str"]["Name"],
@@ -77,89 +89,98 @@ def extract_top_level_categories(raw_data):
         logging.error(f"Error extracting top-level categories: {e}")
         return []
 
-# Scrape products for a category
-def scrape_category_products(slug):
-    """Fetch all products for a category."""
-    print(f"Fetching products for category: {slug}...")
-    all_products = []
-    page_number = 1
-    total_pages = 1  # Initial value to enter the loop
-
-    while page_number <= total_pages:
-        payload = {
-            "versionInfo": {"moduleVersion": "dPDo1Ys8_I6+3zDZC4+jLQ", "apiVersion": "bYh0SIb+kuEKWPesnQKP1A"},
-            "viewName": "MainFlow.ProductListPage",
-            "screenData": {"variables": {"PageNumber": page_number, "CategorySlug": slug}},
-        }
-        try:
-            response = requests.post(f"{BASE_URL}{PRODUCTS_ENDPOINT}", headers=HEADERS, json=payload)
-            response.raise_for_status()
-            data = response.json()
-
-            products = data.get("data", {}).get("ProductList", {}).get("List", [])
-            total_pages = data.get("data", {}).get("TotalPages", 1)
-            all_products.extend(products)
+# Load cached top-level categories
+def load_cached_categories():
+    """Return the saved top-level categories if the file is younger than CATEGORIES_TTL, else None."""
+    try:
+        if time.time() - os.path.getmtime(CATEGORIES_FILE) < CATEGORIES_TTL:
+            with open(CATEGORIES_FILE, "rb") as f:
+                return orjson.loads(f.read())
+    except FileNotFoundError:
+        pass
+    except (OSError, orjson.JSONDecodeError) as e:
+        logging.warning(f"Ignoring cached categories in {CATEGORIES_FILE}: {e}")
+    return None
+
+# Fetch a single page of products
+async def fetch_product_page(session, slug, page_number, sem):
+    """Fetch one page of products for a category and return (products, total_pages)."""
+    payload = {
+        "versionInfo": {"moduleVersion": "dPDo1Ys8_I6+3zDZC4+jLQ", "apiVersion": "bYh0SIb+kuEKWPesnQKP1A"},
+        "viewName": "MainFlow.ProductListPage",
+        "screenData": {"variables": {"PageNumber": page_number, "CategorySlug": slug}},
+    }
+    data = await request(session, "POST", f"{BASE_URL}{PRODUCTS_ENDPOINT}", read_json, sem=sem, json=payload)
 
-            page_number += 1
-        except Exception as e:
-            logging.error(f"Failed to fetch products for {slug}, page {page_number}: {e}")
-            break
+    products = data.get("data", {}).get("ProductList", {}).get("List", [])
+    total_pages = data.get("data", {}).get("TotalPages", 1)
+    return products, total_pages
 
-    category_file = os.path.join(OUTPUT_DIR, f"{slug}.json")
-    with open(category_file, "w", encoding="utf-8") as f:
-        json.dump(all_products, f, indent=4, ensure_ascii=False)
-    logging.info(f"Saved {len(all_products)} products for category '{slug}' to {category_file}.")
+# Scrape products for a category
+async def scrape_category_products(session, slug, sem):
+    """Fetch all products for a category; pages after the first are fetched concurrently."""
+    logging.info(f"Fetching products for category: {slug}...")
+    try:
+        all_products, total_pages = await fetch_product_page(session, slug, 1, sem)
+    except Exception as e:
+        logging.error(f"Failed to fetch products for {slug}, page 1: {e}")
+        all_products, total_pages = [], 1
+
+    pages = await asyncio.gather(
+        *(fetch_product_page(session, slug, page_number, sem) for page_number in range(2, total_pages + 1)),
+        return_exceptions=True
+    )
+    for page_number, page in enumerate(pages, start=2):
+        if isinstance(page, Exception):
+            logging.error(f"Failed to fetch products for {slug}, page {page_number}: {page}")
+            continue
+        products, _ = page
+        all_products.extend(products)
+
+    logging.info(f"Fetched {len(all_products)} products for category '{slug}'.")
     return all_products
 
 # Main function to coordinate scraping
-async def scrape_plus_data():
-    async with aiohttp.ClientSession() as session:
-        # Fetch version token
-        logging.info("Fetching API version info...")
-        version_token = await fetch_version_token(session)
-        if not version_token:
-            logging.error("Failed to fetch version token. Exiting.")
-            return
-
-        # Fetch categories
-        logging.info("Fetching categories...")
-        raw_data = await fetch_categories(session, version_token)
-        if not raw_data:
-            logging.error("Failed to fetch categories. Exiting.")
-            return
-
-        # Extract and save top-level categories
-        top_categories = extract_top_level_categories(raw_data)
-        with open(CATEGORIES_FILE, "w", encoding="utf-8") as f:
-            json.dump(top_categories, f, indent=4, ensure_ascii=False)
-        logging.info(f"Saved top-level categories to {CATEGORIES_FILE}.")
-
-        # Scrape products for each category
+async def scrape_plus_data(connector=None):
+    """Scrape all Plus products."""
+    async with open_session(HEADERS, 60, connector) as session:
+        # Categories rarely change; a recent categories file saves the version and category requests
+        top_categories = load_cached_categories()
+        if top_categories:
+            logging.info(f"Using cached top-level categories from {CATEGORIES_FILE}.")
+        else:
+            # Fetch version token
+            logging.info("Fetching API version info...")
+            version_token = await fetch_version_token(session)
+            if not version_token:
+                logging.error("Failed to fetch version token. Exiting.")
+                return
+
+            # Fetch categories
+            logging.info("Fetching categories...")
+            categories_json = await fetch_categories(session, version_token)
+            if not categories_json:
+                logging.error("Failed to fetch categories. Exiting.")
+                return
+
+            # Extract and save top-level categories
+            top_categories = extract_top_level_categories(categories_json)
+            await asyncio.to_thread(write_json, CATEGORIES_FILE, top_categories)
+            logging.info(f"Saved top-level categories to {CATEGORIES_FILE}.")
+
+        # Scrape products for all categories concurrently
+        sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        results = await asyncio.gather(
+            *(scrape_category_products(session, category["Slug"], sem) for category in top_categories)
+        )
         all_products = []
-        for category in top_categories:
-            slug = category["Slug"]
-            category_file = os.path.join(OUTPUT_DIR, f"{slug}.json")
-
-            if not os.path.exists(category_file):
-                products = scrape_category_products(slug)
-                all_products.extend(products)
+        for products in results:
+            all_products.extend(products)
 
         # Save all products to a single file
-        with open(ALL_PRODUCTS_FILE, "w", encoding="utf-8") as f:
-            json.dump(all_products, f, indent=4, ensure_ascii=False)
+        await asyncio.to_thread(write_json, ALL_PRODUCTS_FILE, all_products)
         logging.info(f"Saved all products to {ALL_PRODUCTS_FILE}.")
 
-        # Cleanup: Delete individual category files
-        for category in top_categories:
-            slug = category["Slug"]
-            category_file = os.path.join(OUTPUT_DIR, f"{slug}.json")
-            if os.path.exists(category_file):
-                try:
-                    os.remove(category_file)
-                    logging.info(f"Deleted file: {category_file}")
-                except Exception as e:
-                    logging.error(f"Failed to delete file {category_file}: {e}")
-
 # Initialize logging
 def initialize_logging():
     """Set up logging."""
@@ -174,4 +195,4 @@ def initialize_logging():
 
 if __name__ == "__main__":
     initialize_logging()
-    asyncio.run(scrape_plus_data())
+    run_loop(scrape_plus_data())
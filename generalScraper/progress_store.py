@@ -0,0 +1,31 @@
+import sqlite3
+
+PROGRESS_DB = "data/progress.db"
+
+class ProgressStore:
+    """Scraped IDs per scraper, persisted incrementally in a shared SQLite database."""
+
+    def __init__(self, scraper, db_path=PROGRESS_DB):
+        self.scraper = scraper
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        # `id` is left untyped so integer IDs come back as integers
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS scraped (scraper TEXT, kind TEXT, id, PRIMARY KEY (scraper, kind, id))"
+        )
+
+    def load(self, kind):
+        """Return the set of IDs of the given kind (e.g. 'product', 'category') scraped so far."""
+        rows = self.conn.execute(
+            "SELECT id FROM scraped WHERE scraper = ? AND kind = ?", (self.scraper, kind)
+        )
+        return {row[0] for row in rows}
+
+    def add(self, kind, ids):
+        """Record IDs of the given kind as scraped."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO scraped VALUES (?, ?, ?)",
+                ((self.scraper, kind, i) for i in ids)
+            )
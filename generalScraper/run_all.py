@@ -0,0 +1,70 @@
+import asyncio
+import contextvars
+import logging
+import sys
+import time
+
+from ah_scraper import AHScraper
+from aldi_scraper import AldiScraper
+from jumbo_scraper import EnhancedJumboScraper
+from http_client import close_connector, get_connector, run_loop
+from plus_scraper import scrape_plus_data
+
+# Each entry starts a shop's scrape on the given (shared) TCP connector
+SCRAPERS = {
+    'ah': lambda connector: AHScraper().scrape(connector),
+    'aldi': lambda connector: AldiScraper().scrape(connector),
+    'jumbo': lambda connector: EnhancedJumboScraper().scrape(connector),
+    'plus': scrape_plus_data,
+}
+
+# Shop of the scraper task that is currently running; every gathered task gets its own copy
+current_shop = contextvars.ContextVar("current_shop", default="-")
+
+class ShopFilter(logging.Filter):
+    """Tag each log record with the shop of the task that emitted it."""
+    def filter(self, record):
+        record.shop = current_shop.get()
+        return True
+
+async def run_scraper(shop, connector):
+    """Run a single scraper with its log records tagged by shop."""
+    current_shop.set(shop)
+    start_time = time.time()
+    await SCRAPERS[shop](connector)
+    logging.info(f"✅ {shop.upper()} scraper completed in {time.time() - start_time:.2f} seconds")
+
+async def run_all(shops):
+    """Run the given scrapers concurrently in one event loop and return each one's error (or None)."""
+    # One keep-alive pool and DNS cache for all shops; each scraper still has its own session and headers
+    connector = get_connector()
+    try:
+        results = await asyncio.gather(*(run_scraper(shop, connector) for shop in shops), return_exceptions=True)
+    finally:
+        await close_connector()
+    for shop, result in zip(shops, results):
+        if isinstance(result, Exception):
+            logging.error(f"{shop.upper()} scraper failed: {result!r}")
+    return dict(zip(shops, results))
+
+# Initialize logging
+def initialize_logging(debug_level=logging.INFO):
+    handlers = [
+        logging.FileHandler("run_all.log"),
+        logging.StreamHandler()
+    ]
+    for handler in handlers:
+        handler.addFilter(ShopFilter())
+    logging.basicConfig(
+        level=debug_level,
+        format="%(asctime)s - %(shop)s - %(levelname)s - %(message)s",
+        handlers=handlers
+    )
+
+if __name__ == "__main__":
+    initialize_logging()
+    shops = [arg.lower() for arg in sys.argv[1:]] or list(SCRAPERS)
+    invalid_shops = set(shops) - set(SCRAPERS)
+    if invalid_shops:
+        sys.exit(f"Invalid shops {invalid_shops}. Available shops are: {list(SCRAPERS)}")
+    run_loop(run_all(shops))
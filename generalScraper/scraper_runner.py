@@ -1,95 +1,60 @@
 import os
 import sys
-import multiprocessing
-import subprocess
 import time
 import json
 from typing import List, Dict
 
+from http_client import run_loop
+from run_all import ShopFilter, run_all
+
 # Logging setup
 import logging
 
+log_handler = logging.FileHandler('logs/scraper_runner.log')
+log_handler.addFilter(ShopFilter())
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    filename='logs/scraper_runner.log'
+    format='%(asctime)s - %(shop)s - %(levelname)s - %(message)s',
+    handlers=[log_handler]
 )
 
 # Configuration
 BASE_INPUT_DIR = 'data'  # Matches your existing data directory
-SCRAPER_DIR = os.path.dirname(os.path.abspath(__file__))  # Directory where scrapers are located
 SHOPS = ['ah', 'jumbo', 'aldi', 'plus']  # List of supported scrapers
 
-def run_scraper_process(shop: str, result_dict: Dict):
+def count_products(shop: str) -> int:
     """
-    Run a scraper script as a standalone subprocess.
+    Count the products in a scraper's output file (JSONL, or a JSON array for older scrapers).
     """
-    script_path = os.path.join(SCRAPER_DIR, f"{shop}_scraper.py")
-
-    if not os.path.exists(script_path):
-        logging.error(f"Scraper script not found: {script_path}")
-        result_dict[shop] = {"total_products": 0, "status": "failed", "error": "Script not found"}
-        return
-
-    try:
-        logging.info(f"🚀 Starting {shop.upper()} scraper...")
-
-        start_time = time.time()
-        
-        # Run the scraper script as a subprocess
-        process = subprocess.run(
-            [sys.executable, script_path],
-            capture_output=True,
-            text=True
-        )
-        
-        end_time = time.time()
-        elapsed_time = round(end_time - start_time, 2)
-
-        # Capture logs and errors
-        if process.returncode == 0:
-            logging.info(f"✅ {shop.upper()} scraper completed in {elapsed_time} seconds")
-            output_path = os.path.join(BASE_INPUT_DIR, f"{shop}_products.json")
-
-            if os.path.exists(output_path):
-                with open(output_path, "r", encoding="utf-8") as f:
-                    products = json.load(f)
-                    total_products = len(products)
-            else:
-                total_products = 0
-
-            result_dict[shop] = {"total_products": total_products, "status": "success"}
-        else:
-            logging.error(f"❌ {shop.upper()} scraper failed. Error:\n{process.stderr}")
-            result_dict[shop] = {"total_products": 0, "status": "failed", "error": process.stderr}
+    jsonl_path = os.path.join(BASE_INPUT_DIR, f"{shop}_products.jsonl")
+    if os.path.exists(jsonl_path):
+        with open(jsonl_path, "r", encoding="utf-8") as f:
+            return sum(1 for line in f if line.strip())
 
-    except Exception as e:
-        logging.error(f"❌ Error running {shop}_scraper.py: {e}")
-        result_dict[shop] = {"total_products": 0, "status": "failed", "error": str(e)}
+    json_path = os.path.join(BASE_INPUT_DIR, f"{shop}_products.json")
+    if os.path.exists(json_path):
+        with open(json_path, "r", encoding="utf-8") as f:
+            return len(json.load(f))
+
+    return 0
 
 
 def run_scrapers_parallel(shops: List[str]) -> Dict[str, Dict]:
     """
-    Run scrapers in parallel using multiprocessing.
+    Run scrapers concurrently in a single event loop sharing one connection pool.
     """
-    manager = multiprocessing.Manager()
-    results = manager.dict()
-
     total_start_time = time.time()
-    processes = []
-
-    for shop in shops:
-        p = multiprocessing.Process(target=run_scraper_process, args=(shop, results))
-        p.start()
-        processes.append(p)
-
-    for p in processes:
-        p.join()
-
+    errors = run_loop(run_all(shops))
     total_end_time = time.time()
     logging.info(f"Parallel scraping completed in {total_end_time - total_start_time:.2f} seconds")
 
-    return dict(results)
+    results = {}
+    for shop, error in errors.items():
+        if error is None:
+            results[shop] = {"total_products": count_products(shop), "status": "success"}
+        else:
+            results[shop] = {"total_products": 0, "status": "failed", "error": str(error)}
+    return results
 
 
 def main():